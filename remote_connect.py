@@ -1,10 +1,130 @@
+import atexit
+import collections
+import concurrent.futures
+import os
 import paramiko
+import re
+import select
+import shutil
+import socket
+import sys
 import threading
 import time
 from IPython.core.magic import register_cell_magic
 from IPython import get_ipython
 
 
+MAX_SESSIONS = 10
+
+# Paramiko's default 2 MiB channel window stalls bulky stdout (pip logs,
+# recursive listings) while the sender waits for window adjustments; a
+# 4 MiB window with 32 KiB packets keeps the pipe full on fast links.
+WINDOW_SIZE = 4 * 1024 * 1024
+MAX_PACKET_SIZE = 32 * 1024
+
+
+class _SessionPool:
+    """Pool of pre-opened SSH session channels on a shared transport.
+
+    An SSH session channel only supports a single exec_command, so channels
+    are not reused after release; instead the pool keeps up to `maxsize`
+    channels opened ahead of time so the command hot path skips the
+    channel-open round trip.
+    """
+
+    def __init__(self, transport, maxsize=MAX_SESSIONS):
+        self.transport = transport
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._channels = []
+
+    def _open(self):
+        return self.transport.open_session(
+            window_size=WINDOW_SIZE, max_packet_size=MAX_PACKET_SIZE)
+
+    def acquire(self):
+        with self._lock:
+            if self._channels:
+                return self._channels.pop()
+        return self._open()
+
+    def release(self, channel):
+        try:
+            channel.close()
+        except Exception:
+            pass
+        # Re-open a replacement off the hot path so the next acquire is free.
+        with self._lock:
+            if len(self._channels) < self.maxsize and self.transport.is_active():
+                try:
+                    self._channels.append(self._open())
+                except Exception:
+                    pass
+
+    def close(self):
+        with self._lock:
+            for channel in self._channels:
+                try:
+                    channel.close()
+                except Exception:
+                    pass
+            self._channels = []
+
+
+def _write_bytes(stream, data):
+    """Write raw bytes to a text stream's underlying binary buffer.
+
+    Avoids the decode -> re-encode round trip for output that is only
+    passed along. Jupyter's OutStream has no .buffer, so decode there.
+    """
+    buffer = getattr(stream, 'buffer', None)
+    if buffer is not None:
+        buffer.write(data)
+    else:
+        stream.write(data.decode('utf-8', 'replace'))
+    stream.flush()
+
+
+def _drain(channel, out=None, err=None, capture=False):
+    """Read a channel incrementally until the remote command exits.
+
+    Pulls stdout/stderr in 64 KiB chunks as they arrive (blocking in
+    select between chunks), writing them to `out`/`err` when given so the
+    user sees output live. With capture=True the chunks are also collected
+    and returned decoded. Returns (exit_code, output, error); output and
+    error are '' unless capture is set.
+    """
+    out_chunks = []
+    err_chunks = []
+    while True:
+        select.select([channel], [], [])
+        progressed = False
+        while channel.recv_ready():
+            data = channel.recv(65536)
+            if not data:
+                break
+            progressed = True
+            if out is not None:
+                _write_bytes(out, data)
+            if capture:
+                out_chunks.append(data)
+        while channel.recv_stderr_ready():
+            data = channel.recv_stderr(65536)
+            if not data:
+                break
+            progressed = True
+            if err is not None:
+                _write_bytes(err, data)
+            if capture:
+                err_chunks.append(data)
+        if not progressed and (channel.exit_status_ready() or channel.eof_received):
+            break
+    exit_code = channel.recv_exit_status()
+    output = b''.join(out_chunks).decode('utf-8', 'replace') if capture else ''
+    error = b''.join(err_chunks).decode('utf-8', 'replace') if capture else ''
+    return exit_code, output, error
+
+
 class VMSConnection:
     def __init__(self, hostname, username, password=None, key_filename=None, 
                  port=22, tmux_session='vms_session', venv_name='venv'):
@@ -16,35 +136,60 @@ class VMSConnection:
         self.tmux_session = tmux_session
         self.venv_name = venv_name
         
-        self.ssh_client = None
+        self.transport = None
         self.sftp_client = None
-        self.keepalive_thread = None
         self.connected = False
+        self._pool = None
+        self._venv_cache = {}
+        self._cmd_cache = collections.OrderedDict()
+        self._host_key = None
         
+    def _load_key(self):
+        for key_cls in (paramiko.Ed25519Key, paramiko.ECDSAKey, paramiko.RSAKey):
+            try:
+                return key_cls.from_private_key_file(self.key_filename)
+            except paramiko.SSHException:
+                continue
+        raise paramiko.SSHException(f"Unable to load private key {self.key_filename}")
+
     def connect(self):
         try:
-            self.ssh_client = paramiko.SSHClient()
-            self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            connect_kwargs = {
-                'hostname': self.hostname,
-                'port': self.port,
-                'username': self.username,
-            }
-            
-            if self.password:
-                connect_kwargs['password'] = self.password
+            sock = socket.create_connection((self.hostname, self.port), timeout=10)
+            transport = paramiko.Transport(
+                sock,
+                default_window_size=WINDOW_SIZE,
+                default_max_packet_size=MAX_PACKET_SIZE)
+            # Text-heavy output (pip logs, listings) compresses well and the
+            # link, not the CPU, is the bottleneck here.
+            transport.use_compression(True)
+            transport.start_client(timeout=10)
+
+            # Validate the server against the key seen on the first connect;
+            # cheaper than SSHClient's host-key policy machinery and it
+            # catches a changed host across reconnects.
+            host_key = transport.get_remote_server_key()
+            if self._host_key is None:
+                self._host_key = host_key
+            elif host_key != self._host_key:
+                transport.close()
+                raise paramiko.SSHException(
+                    f"Host key for {self.hostname} changed since first connect")
+
             if self.key_filename:
-                connect_kwargs['key_filename'] = self.key_filename
-                
-            self.ssh_client.connect(**connect_kwargs)
-            self.sftp_client = self.ssh_client.open_sftp()
+                transport.auth_publickey(self.username, self._load_key())
+            else:
+                transport.auth_password(self.username, self.password or '')
+
+            self.transport = transport
+            self.sftp_client = paramiko.SFTPClient.from_transport(transport)
+            self._pool = _SessionPool(transport)
             self._setup_tmux_session()
-            
+
             self.connected = True
-            self.keepalive_thread = threading.Thread(target=self._keepalive, daemon=True)
-            self.keepalive_thread.start()
-            
+            # Keepalives are sent by the transport's own dispatch thread;
+            # no dedicated Python thread needed.
+            transport.set_keepalive(30)
+
             print(f"✓ Connected to {self.hostname} (tmux session: {self.tmux_session})")
             
         except Exception as e:
@@ -53,37 +198,78 @@ class VMSConnection:
             
     def _setup_tmux_session(self):
         check_cmd = f"tmux has-session -t {self.tmux_session} 2>/dev/null"
-        stdin, stdout, stderr = self.ssh_client.exec_command(check_cmd)
-        exit_code = stdout.channel.recv_exit_status()
-        
+        channel = self._pool.acquire()
+        channel.exec_command(check_cmd)
+        exit_code = channel.recv_exit_status()
+        self._pool.release(channel)
+
         if exit_code != 0:
             create_cmd = f"tmux new-session -d -s {self.tmux_session}"
-            self.ssh_client.exec_command(create_cmd)
+            channel = self._pool.acquire()
+            channel.exec_command(create_cmd)
+            channel.recv_exit_status()
+            self._pool.release(channel)
             print(f"Creating default tmux session: {self.tmux_session}")
             
         
+    def _reconnect(self):
+        print("⚠ Connection lost, reconnecting...")
+        try:
+            if self.transport:
+                self.transport.close()
+        except Exception:
+            pass
+        self.connected = False
+        self.connect()
+
     def execute(self, command):
         if not self.connected: raise RuntimeError("Not connected. Call connect() first.")
-        stdin, stdout, stderr = self.ssh_client.exec_command(command)
-        output = stdout.read().decode('utf-8')
-        error = stderr.read().decode('utf-8')
-        exit_code = stdout.channel.recv_exit_status()
+        try:
+            channel = self._pool.acquire()
+            channel.exec_command(command)
+        except (paramiko.SSHException, socket.error):
+            # Transport died since the last command; reconnect once and retry.
+            self._reconnect()
+            channel = self._pool.acquire()
+            channel.exec_command(command)
+        exit_code, output, error = _drain(channel, capture=True)
+        self._pool.release(channel)
         return output, error, exit_code
 
 
+    CMD_CACHE_SIZE = 64
+
+    def execute_cached(self, command, ttl=5.0):
+        """Run a read-only command, memoizing its result for `ttl` seconds.
+
+        Only use this for idempotent probes (`test -f ...`, `pip list |
+        grep ...`): within the TTL a repeated probe costs a dict lookup
+        instead of an SSH round trip. The cache is bounded LRU-style at
+        CMD_CACHE_SIZE entries and cleared whenever this module mutates
+        the remote environment (venv creation, package installs).
+        """
+        now = time.monotonic()
+        entry = self._cmd_cache.get(command)
+        if entry is not None:
+            deadline, result = entry
+            if now < deadline:
+                self._cmd_cache.move_to_end(command)
+                return result
+            del self._cmd_cache[command]
+
+        result = self.execute(command)
+        self._cmd_cache[command] = (now + ttl, result)
+        if len(self._cmd_cache) > self.CMD_CACHE_SIZE:
+            self._cmd_cache.popitem(last=False)
+        return result
+
     def execute_streaming(self, command):
         if not self.connected: raise RuntimeError("Not connected. Call connect() first.")
-        stdin, stdout, stderr = self.ssh_client.exec_command(command)
-        channel = stdout.channel
-        while not channel.exit_status_ready():
-            if channel.recv_ready():
-                data = channel.recv(1024).decode('utf-8')
-                print(data, end='', flush=True)
-            time.sleep(0.1)
-        while channel.recv_ready():
-            data = channel.recv(1024).decode('utf-8')
-            print(data, end='', flush=True)
-        exit_code = channel.recv_exit_status()
+        channel = self._pool.acquire()
+        channel.set_combine_stderr(True)
+        channel.exec_command(command)
+        exit_code, _, _ = _drain(channel, out=sys.stdout)
+        self._pool.release(channel)
         return exit_code
 
     def run_python_file(self, filename, venv_name=None):
@@ -94,27 +280,91 @@ class VMSConnection:
 
 
     def execute_and_print(self, commands):
-        for cmd in commands.strip().split('\n'):
-            cmd = cmd.strip()
-            if not cmd or cmd.startswith('#'):
-                continue
-                
-            print(f"$ {cmd}")
-            output, error, exit_code = self.execute(cmd)
-            
-            if output:
-                print(output)
-            if error:
-                print(f"Error: {error}")
+        if not self.connected: raise RuntimeError("Not connected. Call connect() first.")
+        script = commands.strip()
+        if not script:
+            return
+
+        # Pipe the whole cell to one remote `bash -s`: a single round trip
+        # no matter how many lines it has, and bash handles comments and
+        # blank lines itself. PS4 + set -x reproduces the old `$ cmd` echo.
+        script = "PS4='$ '\nset -x\n" + script + '\n'
+        try:
+            channel = self._pool.acquire()
+            channel.exec_command('bash -s')
+        except (paramiko.SSHException, socket.error):
+            self._reconnect()
+            channel = self._pool.acquire()
+            channel.exec_command('bash -s')
+        channel.sendall(script.encode('utf-8'))
+        channel.shutdown_write()
+        _drain(channel, out=sys.stdout, err=sys.stderr)
+        self._pool.release(channel)
                 
+    def _venv_exists(self, venv_name):
+        """Check whether a venv exists on the remote host.
+
+        The result is cached for the life of the connection -- venvs don't
+        appear or disappear mid-session unless we create them ourselves, so
+        one round trip per venv is enough.
+        """
+        cached = self._venv_cache.get(venv_name)
+        if cached is not None:
+            return cached
+        _, _, exit_code = self.execute(f"test -f {venv_name}/bin/python3")
+        exists = exit_code == 0
+        self._venv_cache[venv_name] = exists
+        return exists
+
+    def refresh_venv_cache(self):
+        self._venv_cache.clear()
+
     def create_venv(self, venv_name=None):
         if venv_name is None:
             venv_name = self.venv_name
-            
+
+        if self._venv_exists(venv_name):
+            print(f"✓ Virtual environment '{venv_name}' already exists")
+            return
+
         print(f"Creating virtual environment: {venv_name}")
         self.execute_and_print(f"python3 -m venv {venv_name}")
+        self._venv_cache[venv_name] = True
+        self._cmd_cache.clear()
         print(f"✓ Virtual environment '{venv_name}' created")
         
+    def setup_venv(self, venv_name=None, packages=None, force=False):
+        """Create a venv and install packages in one remote round trip.
+
+        Equivalent to create_venv() followed by install_packages(), but all
+        steps run as a single '&&'-chained shell command over one channel
+        instead of one exec_command (and one SSH round trip) per step.
+        """
+        if venv_name is None:
+            venv_name = self.venv_name
+        if isinstance(packages, str):
+            packages = [packages]
+
+        steps = []
+        if force:
+            steps.append(f"rm -rf {venv_name}")
+        steps.append(f"[ -d {venv_name} ] || python3 -m venv {venv_name}")
+        steps.append(f"{venv_name}/bin/pip install --upgrade pip")
+        if packages:
+            steps.append(f"{venv_name}/bin/pip install {' '.join(packages)}")
+
+        print(f"Setting up virtual environment: {venv_name}")
+        exit_code = self.execute_streaming(' && '.join(steps))
+        self._cmd_cache.clear()
+
+        if exit_code == 0:
+            self._venv_cache[venv_name] = True
+            print(f"✓ Virtual environment '{venv_name}' ready")
+        else:
+            self._venv_cache.pop(venv_name, None)
+            print(f"✗ Virtual environment setup failed (exit code {exit_code})")
+        return exit_code
+
     def install_packages(self, packages, venv_name=None):
         if venv_name is None:
             venv_name = self.venv_name
@@ -125,78 +375,110 @@ class VMSConnection:
         pip_cmd = f"source {venv_name}/bin/activate && pip install {' '.join(packages)}"
         print(f"Installing packages: {', '.join(packages)}")
         self.execute_and_print(pip_cmd)
+        self._cmd_cache.clear()
         print(f"✓ Packages installed")
         
         
-    def write_and_run(self, filename, code, venv_name=None):
-        self.write_file(filename, code)
-        self.run_python_file(filename, venv_name)
-                
-    def write_file(self, remote_path, content):
+    def _ensure_sftp(self):
+        """Return the connection's long-lived SFTP client.
+
+        The SFTP subsystem channel is opened once at connect time and
+        reused for every file operation; if the server closed it in the
+        meantime, re-open it once rather than negotiating a fresh
+        subsystem per call.
+        """
         if not self.connected:
             raise RuntimeError("Not connected. Call connect() first.")
-            
-        with self.sftp_client.open(remote_path, 'w') as f:
-            if isinstance(content, str):
-                content = content.encode('utf-8')
+        if self.sftp_client is None or self.sftp_client.get_channel().closed:
+            self.sftp_client = paramiko.SFTPClient.from_transport(self.transport)
+        return self.sftp_client
+
+    def write_and_run(self, filename, code, venv_name=None, append=False):
+        self.write_file(filename, code, append=append)
+        self.run_python_file(filename, venv_name)
+
+    def write_file(self, remote_path, content, append=False):
+        """Write (or with append=True, append to) a remote file over SFTP.
+
+        A single pipelined SFTP write, with no shell involved -- unlike a
+        `cat >> file << EOF` heredoc there is no quoting to get wrong and no
+        risk of the content containing the heredoc terminator.
+        """
+        sftp = self._ensure_sftp()
+
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        if append and not content.endswith(b'\n'):
+            content += b'\n'
+
+        with sftp.open(remote_path, 'ab' if append else 'wb') as f:
+            f.set_pipelined(True)
             f.write(content)
-            
-        print(f"✓ Wrote to {remote_path}")
+
+        print(f"✓ {'Appended' if append else 'Wrote'} to {remote_path}")
         
     def read_file(self, remote_path):
-        if not self.connected:
-            raise RuntimeError("Not connected. Call connect() first.")
-            
-        with self.sftp_client.open(remote_path, 'r') as f:
+        with self._ensure_sftp().open(remote_path, 'rb') as f:
+            f.prefetch()
             content = f.read().decode('utf-8')
             
         return content
         
     def upload_file(self, local_path, remote_path):
-        if not self.connected:
-            raise RuntimeError("Not connected. Call connect() first.")
-            
-        self.sftp_client.put(local_path, remote_path)
+        with open(local_path, 'rb') as local_f, \
+                self._ensure_sftp().open(remote_path, 'wb') as remote_f:
+            # Pipelined writes don't wait for a server ack per chunk, so the
+            # transfer is bounded by bandwidth instead of RTT * chunk count.
+            remote_f.set_pipelined(True)
+            shutil.copyfileobj(local_f, remote_f, length=1 << 20)
         print(f"✓ Uploaded {local_path} → {remote_path}")
         
     def download_file(self, remote_path, local_path):
-        if not self.connected:
-            raise RuntimeError("Not connected. Call connect() first.")
-            
-        self.sftp_client.get(remote_path, local_path)
+        with self._ensure_sftp().open(remote_path, 'rb') as remote_f, \
+                open(local_path, 'wb') as local_f:
+            remote_f.prefetch()
+            shutil.copyfileobj(remote_f, local_f, length=1 << 20)
         print(f"✓ Downloaded {remote_path} → {local_path}")
         
-    def _keepalive(self):
-        while self.connected:
-            try:
-                transport = self.ssh_client.get_transport()
-                if transport and transport.is_active():
-                    transport.send_ignore()
-                else:
-                    print("⚠ Connection lost")
-                    self.connected = False
-                    break
-            except Exception as e:
-                print(f"⚠ Keepalive error: {e}")
-                self.connected = False
-                break
-                
-            time.sleep(60)
-            
     def disconnect(self):
         self.connected = False
-        
+
+        if self._pool:
+            self._pool.close()
+
         if self.sftp_client:
             self.sftp_client.close()
-            
-        if self.ssh_client:
-            self.ssh_client.close()
+
+        if self.transport:
+            self.transport.close()
             
         print(f"✓ Disconnected from {self.hostname}")
 
 
 vms_conn = None
 
+# Executor for %%vms --async cells. paramiko is blocking, so background
+# cells run on worker threads; each execute() takes its own channel from
+# the session pool, so several cells can be in flight on one transport.
+_executor = None
+_async_jobs = []
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=MAX_SESSIONS, thread_name_prefix='vms')
+    return _executor
+
+
+def _report_async(future):
+    exc = future.exception()
+    if exc is not None:
+        print(f"✗ Background command failed: {exc}")
+    else:
+        print("✓ Background command finished")
+
 
 def save_config(input_str, config_file='connection_config.txt'):
     parts = input_str.strip().split()
@@ -212,25 +494,63 @@ def save_config(input_str, config_file='connection_config.txt'):
         f.write(f"tmux_session=vms_session\n")
         f.write(f"venv_name=venv\n")
     
+    _CONFIG_CACHE.pop(os.path.abspath(config_file), None)
     print(f"✓ Config saved to {config_file}")
 
 
+# Parsed configs keyed by absolute path; the value records the stat of the
+# file at parse time so an edited config is picked up automatically.
+_CONFIG_CACHE = {}
+
+# One key=value pair per line; comment lines are excluded by the key
+# charset, and surrounding whitespace is stripped by the pattern itself.
+_CONFIG_LINE_RE = re.compile(
+    r'(?m)^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.*?)[ \t]*$')
+
+
+def clear_config_cache():
+    _CONFIG_CACHE.clear()
+
+
 def load_config(config_file='connection_config.txt'):
-    config = {}
+    path = os.path.abspath(config_file)
+    st = os.stat(path)
+    stat_key = (st.st_mtime_ns, st.st_size)
+
+    cached = _CONFIG_CACHE.get(path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1].copy()
+
     with open(config_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#'):
-                key, value = line.split('=', 1)
-                config[key.strip()] = value.strip()
-    return config
+        config = dict(_CONFIG_LINE_RE.findall(f.read()))
+
+    _CONFIG_CACHE[path] = (stat_key, config)
+    return config.copy()
+
+
+def _close_on_exit():
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    if vms_conn is not None and vms_conn.connected:
+        vms_conn.disconnect()
+
 
+atexit.register(_close_on_exit)
 
-def setup_vms_connection(config_file='connection_config.txt'):
+
+def setup_vms_connection(config_file='connection_config.txt', connect=True):
     global vms_conn
-    
+
     config = load_config(config_file)
-    
+
+    # Reuse the existing connection if it's still alive and points at the
+    # same host -- SSH setup (TCP + key exchange + auth) dominates latency.
+    if (vms_conn is not None and vms_conn.connected
+            and vms_conn.hostname == config.get('hostname')
+            and vms_conn.username == config.get('username')):
+        print(f"✓ Reusing existing connection to {vms_conn.hostname}")
+        return
+
     vms_conn = VMSConnection(
         hostname=config.get('hostname'),
         username=config.get('username'),
@@ -240,23 +560,106 @@ def setup_vms_connection(config_file='connection_config.txt'):
         tmux_session=config.get('tmux_session', 'vms_session'),
         venv_name=config.get('venv_name', 'venv')
     )
-    
-    vms_conn.connect()
-    
+
+    if connect:
+        vms_conn.connect()
+
+
+def _ensure_connection():
+    """Connect lazily: the SSH round trip happens on first use, not import."""
+    global vms_conn
+    if vms_conn is None:
+        setup_vms_connection(connect=False)
+    if not vms_conn.connected:
+        vms_conn.connect()
+    return vms_conn
+
+
+def setup_venv(venv_name=None, packages=None, force_reinstall=False):
+    """Module-level convenience wrapper around VMSConnection.setup_venv()."""
+    conn = _ensure_connection()
+    return conn.setup_venv(venv_name, packages, force=force_reinstall)
+
+
+# Python-mode magic lines: python[:venv] [persistent [filename]], parsed in
+# one C-level scan instead of a chain of startswith/split/strip calls per cell.
+_MAGIC_LINE_RE = re.compile(
+    r'^python(?::(?P<venv>[\w.-]+))?'
+    r'(?:\s+(?P<persistent>persistent)(?:\s+(?P<fname>\S+))?)?\s*$')
+
+
+def _run_vms_cell(line, cell):
+    """Dispatch one %%vms cell (see the vms magic docstring for the grammar)."""
+    conn = _ensure_connection()
+
+    if not line or not line.startswith('python'):
+        # Legacy form: `%%vms venv_name filename` writes and runs the cell.
+        parts = line.split()
+        if len(parts) == 2:
+            venv_name, filename = parts
+            conn.write_and_run(filename, cell, venv_name)
+        else:
+            conn.execute_and_print(cell)
+        return
+
+    m = _MAGIC_LINE_RE.match(line)
+    if m is None:
+        print(f"✗ Unrecognized %%vms line: {line!r}")
+        return
+
+    venv_name = m.group('venv')
+    persistent = m.group('persistent') is not None
+    filename = m.group('fname') or 'persistent.py'
+
+    if venv_name is None and conn._venv_exists(conn.venv_name):
+        venv_name = conn.venv_name
+    python_cmd = f'{venv_name}/bin/python3' if venv_name else 'python3'
+
+    if not persistent:
+        filename = '.vms_cell.py'
+        conn.write_file(filename, cell)
+    else:
+        conn.write_file(filename, cell, append=True)
+    conn.execute_streaming(f'{python_cmd} {filename}')
+
+
+def _register_vms_magic():
+    ip = get_ipython()
+    if ip is None:
+        return
+
+    # On a module reload, drop any previously registered `vms` first so the
+    # stale function (closed over the old module's globals) is released
+    # instead of silently piling up behind the new registration.
+    ip.magics_manager.magics['cell'].pop('vms', None)
+
     @register_cell_magic
     def vms(line, cell):
-        if vms_conn is None or not vms_conn.connected:
-            print("✗ Not connected. Run setup_vms_connection() first.")
-            return
-        
+        """Run a cell on the remote VMS host.
+
+        Usage:
+            %%vms                           shell commands
+            %%vms python                    Python (default venv if present)
+            %%vms python:my_env             Python in a specific venv
+            %%vms python persistent f.py    append cell to f.py and run it
+            %%vms my_env script.py          write cell to script.py, run in venv
+            %%vms --async ...               any of the above, in the background
+        """
         line = line.strip()
-        
-        if line:
-            parts = line.split()
-            if len(parts) == 2:
-                venv_name, filename = parts[0], parts[1]
-                vms_conn.write_and_run(filename, cell, venv_name)
-            else:
-                vms_conn.execute_and_print(cell)
-        else:
-            vms_conn.execute_and_print(cell)
+
+        run_async = False
+        if line.startswith('--async'):
+            run_async = True
+            line = line[len('--async'):].strip()
+
+        if run_async:
+            future = _get_executor().submit(_run_vms_cell, line, cell)
+            future.add_done_callback(_report_async)
+            _async_jobs.append(future)
+            print("⏳ Running in background (output appears when ready)")
+            return future
+
+        _run_vms_cell(line, cell)
+
+
+_register_vms_magic()